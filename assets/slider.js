@@ -0,0 +1,42 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    slider: {
+        // Label and count text follow the slider while it is dragged, from the per-window
+        // totals update_all sends; the figures update when it is released
+        window_text: function (dragValue, totals, value) {
+            const days = dragValue ?? value;
+            const label = `Currently Showing ${days} Days Of Crashes`;
+            if (!totals) {
+                return [label, window.dash_clientside.no_update];
+            }
+            const [reports, deaths] = totals.totals[days - totals.min_days];
+            // TODO: add a date range for what is being shown in the dashboard, to tell user what is the most recent date range
+            const count =
+                `In the most recent ${days} days of available data, there have been ` +
+                `${reports.toLocaleString("en-US")} cyclist injury reports and ` +
+                `${deaths.toLocaleString("en-US")} cyclist deaths across NYC.`;
+            return [
+                label,
+                [
+                    count,
+                    { namespace: "dash_html_components", type: "Br", props: {} },
+                    {
+                        namespace: "dash_html_components",
+                        type: "Small",
+                        props: { children: totals.as_of, className: "text-muted" },
+                    },
+                ],
+            ];
+        },
+
+        // One id per browser tab, so the server can drop a tab's superseded requests
+        session_id: function (current) {
+            if (current) {
+                return current;
+            }
+            if (window.crypto && window.crypto.randomUUID) {
+                return window.crypto.randomUUID();
+            }
+            return Math.random().toString(36).slice(2) + Date.now().toString(36);
+        },
+    },
+});
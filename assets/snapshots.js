@@ -0,0 +1,14 @@
+// Snapshot mode (see snapshots.py): fetch the prebuilt outputs for the selected view and
+// window instead of asking the server to render them
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    snapshots: {
+        load: async function (view, days, baseUrl) {
+            const response = await fetch(`${baseUrl}${view}_${days}.json`);
+            if (!response.ok) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const outputs = await response.json();
+            return [outputs.map, outputs.histogram, outputs.totals];
+        },
+    },
+});
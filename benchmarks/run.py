@@ -0,0 +1,183 @@
+"""Offline benchmarks for the data pipeline and figure builders.
+
+Serves synthetic crash rows from a local Socrata stand-in, so nothing touches the
+live NYC API. For each data size, reports latency percentiles, serialized figure
+bytes and peak traced memory for each stage:
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --repeat 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=10, help="runs per stage")
+    parser.add_argument(
+        "--fetch-repeat", type=int, default=3, help="runs of the API fetch stage"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds the stand-in API waits per request"
+    )
+    parser.add_argument("--days", type=int, default=30, help="slider window to render")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="report peak traced memory (tracemalloc slows every stage down)",
+    )
+    return parser.parse_args()
+
+
+def measure(fn, repeat):
+    # latencies for every run; peak memory over all runs, result of the last one
+    timings = []
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    return timings, peak, result
+
+
+def report(size, stage, timings, peak, payload_bytes=None):
+    p50, p95, p99 = np.percentile(np.array(timings) * 1000, [50, 95, 99])
+    payload = f"{payload_bytes / 1e3:10.1f}" if payload_bytes is not None else f"{'-':>10}"
+    memory = f"{peak / 1e6:9.1f}" if peak is not None else f"{'-':>9}"
+    print(f"{size:>9,} {stage:<32} {p50:9.1f} {p95:9.1f} {p99:9.1f} {payload} {memory}")
+
+
+def figure_bytes(fig):
+    return len(fig.to_json())
+
+
+def run_size(size, args, stub_rows):
+    from benchmarks.socrata_stub import SocrataStub
+
+    import constants
+    import crash_store
+    import main
+
+    # a cache of its own per size; on the previous size's files build_crash_data would
+    # only refresh from their newest day and keep their rows
+    crash_store.CACHE_DIR = os.path.join(os.environ["CRASH_CACHE_DIR"], str(size))
+
+    stub = SocrataStub(stub_rows, latency=args.latency)
+    constants.BASE_URL = stub.start()
+    try:
+        days = args.days
+
+        timings, peak, crashes = measure(
+            lambda: constants.fetch_crashes(constants.MAX_DAYS), args.fetch_repeat
+        )
+        report(size, "fetch_crashes", timings, peak)
+
+        # prepared dataset is rebuilt from the raw cache written by the first run
+        timings, peak, crash_data = measure(
+            lambda: constants.build_crash_data(max_age=0), args.fetch_repeat
+        )
+        report(size, "build_crash_data", timings, peak)
+
+        timings, peak, (df, df_killed) = measure(
+            lambda: main.window_frames(crash_data, days), args.repeat
+        )
+        report(size, "window_frames", timings, peak)
+
+        stages = [
+            (
+                "create_density_fig",
+                lambda: main.create_density_fig(df, df_killed, days, main.BOROUGH_COLORS),
+            ),
+            ("create_scatter_fig", lambda: main.create_scatter_fig(df, df_killed, days)),
+            (
+                "create_histogram_fig",
+                lambda: main.create_histogram_fig(crash_data.rollups["borough"], days),
+            ),
+        ]
+        for stage, build in stages:
+            timings, peak, fig = measure(build, args.repeat)
+            report(size, stage, timings, peak, figure_bytes(fig))
+
+        # the full callback through Flask, including JSON serialization of the response
+        main.constants._crash_data = crash_data
+        client = main.server.test_client()
+        # a view change sends whole figures, a slider release patches the traces
+        for view, trigger in [
+            ("density", "dropdown"),
+            ("density", "slider"),
+            ("scatter", "dropdown"),
+            ("scatter", "slider"),
+        ]:
+            # after the first response the page has this version's window totals
+            totals_version = crash_data.version if trigger == "slider" else None
+            body = update_all_request(main, view, days, f"{trigger}.value", totals_version)
+
+            def post(clear_cache=True):
+                if clear_cache:
+                    main._figure_cache.clear()
+                # as a browser would ask, so "KB out" is what goes over the wire
+                return client.post(
+                    "/_dash-update-component",
+                    json=body,
+                    headers={"Accept-Encoding": "gzip, deflate, br"},
+                )
+
+            stage = f"update_all {view} {trigger}"
+            timings, peak, response = measure(post, args.repeat)
+            report(size, stage, timings, peak, len(response.data))
+            timings, peak, response = measure(lambda: post(False), args.repeat)
+            report(size, f"{stage} hit", timings, peak, len(response.data))
+    finally:
+        stub.stop()
+
+
+# `totals_version` is the data version of the window totals the page already has
+def update_all_request(main, view, days, changed="dropdown.value", totals_version=None):
+    output = next(key for key in main.app.callback_map if "map.figure" in key)
+    callback = main.app.callback_map[output]
+    # the map's relayoutData is only an input with VIEWPORT_LOADING on
+    values = {
+        "dropdown": view,
+        "slider": days,
+        "window-totals-version": totals_version,
+    }
+    return {
+        "output": output,
+        "outputs": [
+            {"id": spec.component_id, "property": spec.component_property}
+            for spec in callback["output"]
+        ],
+        "inputs": [dict(spec, value=values.get(spec["id"])) for spec in callback["inputs"]],
+        "changedPropIds": [changed],
+        "state": [dict(spec, value=values.get(spec["id"])) for spec in callback["state"]],
+    }
+
+
+def main():
+    args = parse_args()
+    # keep benchmark caches away from the app's own, and the refresher out of the timings
+    os.environ["CRASH_CACHE_DIR"] = tempfile.mkdtemp(prefix="crash-bench-")
+    os.environ["CRASH_DATA_REFRESH_SECONDS"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from benchmarks.synthetic import crash_rows
+
+    print(
+        f"{'rows':>9} {'stage':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'KB out':>10} {'peak MB':>9}"
+    )
+    if args.trace_memory:
+        tracemalloc.start()
+    for size in args.sizes:
+        run_size(size, args, crash_rows(size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+import operator
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+import numpy as np
+import pandas as pd
+
+
+TERM = re.compile(r"^(\w+)\s*(>=|<=|>|<|=)\s*(?:'([^']*)'|(\S+))$")
+COUNT = re.compile(r"^count\(\*\)(?:\s+AS\s+(\w+))?$", re.IGNORECASE)
+COMPARISONS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "=": operator.eq,
+}
+
+
+# Just enough of the SODA query language for the app's requests: $where as AND-ed
+# terms or parenthesised OR groups, $select of columns or count(*), $limit/$offset
+# paging, ordered by crash_date in the direction $order asks for. `latency` delays
+# every response like a remote API would; `fail_every` answers every nth request with
+# a 503 to exercise retries.
+class SocrataStub:
+    def __init__(self, rows, latency=0.0, fail_every=0):
+        self.rows = rows.sort_values(["crash_date", "collision_id"], ignore_index=True)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self._server = None
+        # every page of a query repeats its $where; filter once per distinct clause
+        self._matches = {}
+        self._matches_lock = threading.Lock()
+
+    def _term_mask(self, term):
+        match = TERM.match(term.strip())
+        if match is None:
+            raise ValueError(f"unsupported $where term: {term!r}")
+        field, op, quoted, bare = match.groups()
+        column = self.rows[field]
+        if quoted is None:
+            column, value = column.astype(float), float(bare)
+        else:
+            # ISO dates compare correctly as strings
+            column, value = column.str.slice(0, len(quoted)), quoted
+        return COMPARISONS[op](column, value).to_numpy()
+
+    def where_mask(self, where):
+        mask = np.ones(len(self.rows), dtype=bool)
+        for clause in where.split(" AND ") if where else []:
+            clause = clause.strip().removeprefix("(").removesuffix(")")
+            mask &= np.logical_or.reduce([self._term_mask(t) for t in clause.split(" OR ")])
+        return mask
+
+    def matching_rows(self, where):
+        with self._matches_lock:
+            if where not in self._matches:
+                self._matches[where] = self.rows[self.where_mask(where)]
+            return self._matches[where]
+
+    def select(self, params):
+        rows = self.matching_rows(params.get("$where", ""))
+
+        select = params.get("$select", "")
+        count = COUNT.match(select.strip())
+        if count:
+            return pd.DataFrame({count.group(1) or "count": [str(len(rows))]})
+
+        if params.get("$order", "").split(",")[0].strip().upper().endswith(" DESC"):
+            rows = rows.iloc[::-1]
+        offset = int(params.get("$offset", 0))
+        rows = rows.iloc[offset : offset + int(params.get("$limit", 1000))]
+        if select:
+            rows = rows[[column.strip() for column in select.split(",")]]
+        return rows
+
+    def query(self, params):
+        # Socrata leaves missing fields out of each record
+        return [
+            {key: value for key, value in record.items() if value is not None}
+            for record in self.select(params).to_dict("records")
+        ]
+
+    # the .csv endpoint: a header of field names, missing fields left empty
+    def query_csv(self, params):
+        return self.select(params).to_csv(index=False)
+
+    def start(self, host="127.0.0.1", port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._requests_lock:
+                    stub.requests += 1
+                    failing = stub.fail_every and stub.requests % stub.fail_every == 0
+                time.sleep(stub.latency)
+                content_type = "application/json"
+                try:
+                    if failing:
+                        body, status = json.dumps({"error": "try again"}), 503
+                    else:
+                        url = urlparse(self.path)
+                        params = dict(parse_qsl(url.query))
+                        if url.path.endswith(".csv"):
+                            body, status = stub.query_csv(params), 200
+                            content_type = "text/csv"
+                        else:
+                            body, status = json.dumps(stub.query(params)), 200
+                except ValueError as error:
+                    body, status = json.dumps({"error": str(error)}), 400
+                    content_type = "application/json"
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/resource/h9gi-nx95.json"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
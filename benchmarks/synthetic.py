@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+
+# Rough centers and spreads (degrees) so points cluster by borough like the real data
+BOROUGH_CENTERS = {
+    "MANHATTAN": (40.7831, -73.9712, 0.03),
+    "BROOKLYN": (40.6782, -73.9442, 0.04),
+    "QUEENS": (40.7282, -73.7949, 0.05),
+    "BRONX": (40.8448, -73.8648, 0.03),
+    "STATEN ISLAND": (40.5795, -74.1502, 0.04),
+}
+VEHICLES = ["Sedan", "Station Wagon/Sport Utility Vehicle", "Bike", "E-Bike", "Taxi", "Box Truck", "Bus"]
+FACTORS = [
+    "Unspecified",
+    "Driver Inattention/Distraction",
+    "Failure to Yield Right-of-Way",
+    "Passing or Lane Usage Improper",
+    "Unsafe Speed",
+    "Pedestrian/Bicyclist/Other Pedestrian Error/Confusion",
+]
+
+
+# Cyclist crash rows shaped like the Socrata API returns them: every field a string,
+# missing fields None. Dates spread over the `days` days before `end`.
+def crash_rows(n, days=60, seed=0, end=None):
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now() - timedelta(days=1)
+
+    boroughs = np.array(list(BOROUGH_CENTERS), dtype=object)
+    borough_codes = rng.integers(0, len(boroughs), n)
+    centers = np.array(list(BOROUGH_CENTERS.values()))[borough_codes]
+    latitude = rng.normal(centers[:, 0], centers[:, 2])
+    longitude = rng.normal(centers[:, 1], centers[:, 2])
+
+    dates = np.datetime64(end.strftime("%Y-%m-%d"), "D") - rng.integers(0, days, n)
+    killed = (rng.random(n) < 0.01).astype(np.int64)
+    injured = np.where(killed == 1, rng.integers(0, 2, n), rng.integers(1, 3, n))
+
+    def pick(choices):
+        return np.array(choices, dtype=object)[rng.integers(0, len(choices), n)]
+
+    def with_missing(values, share):
+        values = values.astype(object)
+        values[rng.random(n) < share] = None
+        return values
+
+    return pd.DataFrame(
+        {
+            "collision_id": (4_000_000 + np.arange(n)).astype(str),
+            "crash_date": np.char.add(dates.astype(str), "T00:00:00.000"),
+            "borough": with_missing(boroughs[borough_codes], 0.03),
+            "latitude": np.char.mod("%.6f", latitude),
+            "longitude": np.char.mod("%.6f", longitude),
+            "number_of_cyclist_injured": injured.astype(str),
+            "number_of_cyclist_killed": killed.astype(str),
+            "contributing_factor_vehicle_1": pick(FACTORS),
+            "vehicle_type_code1": pick(VEHICLES),
+            "vehicle_type_code2": with_missing(pick(VEHICLES), 0.3),
+        }
+    )
@@ -0,0 +1,30 @@
+import threading
+from contextlib import contextmanager
+
+
+# Calls sharing a key run one at a time, and a call that was overtaken by a newer one
+# while it waited is told to skip its work. A burst of requests for the same key then
+# costs the one running plus the newest, not one per request.
+class Coalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> [run lock, newest ticket, calls in flight]
+        self._keys = {}
+
+    @contextmanager
+    def latest(self, key):
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None:
+                entry = self._keys[key] = [threading.Lock(), 0, 0]
+            entry[1] += 1
+            entry[2] += 1
+            ticket = entry[1]
+        try:
+            with entry[0]:
+                yield ticket == entry[1]
+        finally:
+            with self._lock:
+                entry[2] -= 1
+                if entry[2] == 0:
+                    del self._keys[key]
@@ -0,0 +1,101 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+
+# Compresses JSON, JavaScript and text responses for clients that accept it, brotli
+# first. On by default; turn it off when a reverse proxy already compresses.
+ENABLED = os.environ.get("COMPRESS_RESPONSES", "1") == "1"
+MIN_SIZE = 1024
+COMPRESSIBLE = ("application/json", "application/javascript", "text/")
+# Callback responses are compressed on every request, so both favour speed
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# Component suites (plotly.min.js alone is 4.6 MB) are the same bytes on every page
+# load, so their compressed bodies are kept per path, ETag and encoding
+STATIC_CACHE_SIZE = 32
+_static_cache = OrderedDict()
+_static_cache_lock = threading.Lock()
+
+
+def accepted_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept.quality("br") > 0:
+        return "br"
+    if accept.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_static(key, data, encoding):
+    with _static_cache_lock:
+        if key in _static_cache:
+            _static_cache.move_to_end(key)
+            return _static_cache[key]
+
+    data = compress(data, encoding)
+    with _static_cache_lock:
+        _static_cache[key] = data
+        while len(_static_cache) > STATIC_CACHE_SIZE:
+            _static_cache.popitem(last=False)
+    return data
+
+
+# Register before the other after_request hooks: Flask runs them in reverse order, so
+# this one sees the final body and the caches and metrics see uncompressed ones
+def init_app(server, routes_pathname_prefix="/"):
+    if not ENABLED:
+        return
+
+    static_prefix = f"{routes_pathname_prefix}_dash-component-suites/"
+
+    @server.after_request
+    def compress_response(response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE)
+        ):
+            return response
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+
+        encoding = accepted_encoding()
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+        # fingerprinted suite paths change with each build, the others carry an ETag
+        etag, _ = response.get_etag()
+        if request.path.startswith(static_prefix):
+            # Dash compares If-None-Match to the strong tag, which never matches the
+            # weak one a browser sends back for a compressed copy
+            if etag and request.if_none_match.contains_weak(etag):
+                not_modified = Response(status=304)
+                not_modified.set_etag(etag, weak=True)
+                not_modified.vary.add("Accept-Encoding")
+                return not_modified
+            key = (request.full_path, etag, encoding)
+            response.set_data(compress_static(key, data, encoding))
+        else:
+            response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        # the same entity in another encoding; a strong ETag would claim byte equality
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,6 +1,22 @@
+import os
+import io
 import pandas as pd
+from pandas.api.types import union_categoricals
+from collections import namedtuple
 from datetime import datetime, timedelta
-import requests
+import logging
+import threading
+import time
+import asyncio
+import random
+import httpx
+import crash_store
+import geo
+import metrics
+import rollups
+
+
+logger = logging.getLogger(__name__)
 
 
 BOROUGH_COLORS = {
@@ -12,77 +28,461 @@ BOROUGH_COLORS = {
 }
 
 
-DAYS = 30
+# Widest window on the slider. Raw rows are kept for all of it (the map needs them);
+# counts and the histogram come from daily rollups, so years of history stay cheap.
+MAX_DAYS = int(os.environ.get("MAX_DAYS", 60))
+
+# Density windows with at least this many injury crashes are drawn from grid cells of
+# DENSITY_BIN_DEGREES (about 200m) instead of one point per crash
+DENSITY_BINNING_MIN_POINTS = int(os.environ.get("DENSITY_BINNING_MIN_POINTS", 20000))
+DENSITY_BIN_DEGREES = float(os.environ.get("DENSITY_BIN_DEGREES", 0.002))
+
+# Scatter view loads only the injury crashes inside the visible map bounds, at most
+# VIEWPORT_MAX_POINTS of them, looked up in a grid of VIEWPORT_INDEX_DEGREES cells
+VIEWPORT_LOADING = os.environ.get("VIEWPORT_LOADING", "0") == "1"
+VIEWPORT_MAX_POINTS = int(os.environ.get("VIEWPORT_MAX_POINTS", 5000))
+VIEWPORT_INDEX_DEGREES = float(os.environ.get("VIEWPORT_INDEX_DEGREES", 0.01))
+
+# Load the data on a background thread after startup instead of before serving
+# (see gunicorn.conf.py)
+FAST_STARTUP = os.environ.get("FAST_STARTUP", "0") == "1"
+
+# How often the background refresher rebuilds the frames; 0 disables it
+REFRESH_INTERVAL_SECONDS = int(os.environ.get("CRASH_DATA_REFRESH_SECONDS", 60 * 60))
+
+
+# base API url, overridable to point at a stand-in server (see benchmarks/)
+BASE_URL = os.environ.get(
+    "SOCRATA_URL", "https://data.cityofnewyork.us/resource/h9gi-nx95.json"
+)
+
+# Socrata caps unpaged responses at 1000 rows, so every query is fetched page by page
+PAGE_SIZE = int(os.environ.get("SOCRATA_PAGE_SIZE", 5000))
+FETCH_WORKERS = int(os.environ.get("SOCRATA_FETCH_WORKERS", 4))
+FETCH_RETRIES = int(os.environ.get("SOCRATA_FETCH_RETRIES", 3))
+FETCH_BACKOFF_SECONDS = float(os.environ.get("SOCRATA_FETCH_BACKOFF_SECONDS", 0.5))
+REQUEST_TIMEOUT_SECONDS = 30
+
+SELECT_FIELDS = [
+    "collision_id",
+    "crash_date",
+    "borough",
+    "latitude",
+    "longitude",
+    "number_of_cyclist_injured",
+    "number_of_cyclist_killed",
+    "contributing_factor_vehicle_1",
+    "vehicle_type_code1",
+    "vehicle_type_code2",
+]
+
+
+def window_start(days):
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+# Throttled, failed and timed out requests are retried with exponential backoff and
+# full jitter, so concurrent pages that fail together don't retry in lockstep
+async def _get(client, url, params):
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            with metrics.timer("socrata_request_seconds"):
+                response = await client.get(url, params=params)
+            if response.status_code not in RETRY_STATUSES or attempt == FETCH_RETRIES:
+                response.raise_for_status()
+                return response
+        except httpx.TransportError:
+            if attempt == FETCH_RETRIES:
+                raise
+        await asyncio.sleep(random.uniform(0, FETCH_BACKOFF_SECONDS * 2**attempt))
+
+
+# Counts the matching rows while the first page is in flight, then pulls the remaining
+# pages concurrently over one pooled connection set. Pages come from the CSV endpoint
+# and each is parsed into a typed frame as soon as it arrives.
+async def _fetch_pages(params, page_size, workers):
+    # paging needs a total order, crash_date alone has ties
+    paged_params = dict(params, **{"$order": f"{params['$order']}, collision_id"})
+    csv_url = os.path.splitext(BASE_URL)[0] + ".csv"
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    timeout = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+        async def fetch_page(offset):
+            page_params = dict(paged_params, **{"$limit": page_size, "$offset": offset})
+            response = await _get(client, csv_url, page_params)
+            return parse_page(response.content)
+
+        async def count_rows():
+            count_params = {"$select": "count(*) AS total", "$where": params["$where"]}
+            count = (await _get(client, BASE_URL, count_params)).json()
+            return int(count[0]["total"]) if count else 0
+
+        total, first_page = await asyncio.gather(count_rows(), fetch_page(0))
+        rest = await asyncio.gather(
+            *(fetch_page(offset) for offset in range(page_size, total, page_size))
+        )
+    return [first_page, *rest]
+
+
+# Runs on its own event loop, so it can be called from startup code and the refresher
+# thread alike
+def fetch_pages(params, page_size=PAGE_SIZE, workers=FETCH_WORKERS):
+    return asyncio.run(_fetch_pages(params, page_size, workers))
+
+
+COLUMN_NAMES = {
+    "borough": "Borough",
+    "latitude": "Latitude",
+    "longitude": "Longitude",
+    "number_of_cyclist_injured": "Cyclists_Injured",
+    "number_of_cyclist_killed": "Cyclists_Killed",
+    "vehicle_type_code1": "Vehicle_1",
+    "vehicle_type_code2": "Vehicle_2",
+    "contributing_factor_vehicle_1": "Contributing_Factor",
+}
+
+# Socrata returns every field as a string; crash frames are stored with these instead
+SCHEMA = {
+    "collision_id": "int64",
+    "Borough": "category",
+    "Latitude": "float32",
+    "Longitude": "float32",
+    "Cyclists_Injured": "int8",
+    "Cyclists_Killed": "int8",
+    "Contributing_Factor": "category",
+    "Vehicle_1": "category",
+    "Vehicle_2": "category",
+}
+CRASH_COLUMNS = ["crash_date"] + list(SCHEMA)
+
+
+# CSV pages are parsed straight into the stored dtypes, keyed by API field name, so the
+# window never exists as Python dicts or strings. Peak memory is the typed frame plus
+# the pages in flight.
+CSV_DTYPES = {
+    field: SCHEMA.get(COLUMN_NAMES.get(field, field))
+    for field in SELECT_FIELDS
+    if field != "crash_date"
+}
+
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
 
-today = datetime.now()
-days_ago = today - timedelta(days=DAYS)
-days_ago_str = days_ago.strftime("%Y-%m-%d")
+def parse_page(content):
+    page = pd.read_csv(io.BytesIO(content), dtype=CSV_DTYPES)
+    # also typed when the page is empty, unlike read_csv's parse_dates
+    page["crash_date"] = pd.to_datetime(page["crash_date"], format="ISO8601")
+    return page.dropna(subset=["borough", "latitude", "longitude"])
 
 
-def get_crash_data(days=DAYS):
-    today = datetime.now()
-    days_ago = today - timedelta(days=days)
-    days_ago_str = days_ago.strftime("%Y-%m-%d")
-    
-    # base API url
-    base_url = "https://data.cityofnewyork.us/resource/h9gi-nx95.json"
+# Pages parse their categorical columns with their own categories; align them so the
+# concatenated columns stay categorical
+def concat_pages(pages):
+    for field, dtype in CSV_DTYPES.items():
+        if dtype == "category":
+            categories = union_categoricals([page[field] for page in pages]).categories
+            for page in pages:
+                page[field] = page[field].cat.set_categories(categories)
+    return pd.concat(pages, ignore_index=True)
 
-    # Create Injuries variable
-    params_injured = {
-        "$select": "crash_date, borough, latitude, longitude, number_of_cyclist_injured, number_of_cyclist_killed, contributing_factor_vehicle_1, vehicle_type_code1, vehicle_type_code2",
-        "$where": f"number_of_cyclist_injured > 0 AND number_of_cyclist_killed = 0 AND crash_date >= '{days_ago_str}'",
-        "$order": "crash_date DESC",
+
+# Injured and killed crashes come back from one query and are split in memory.
+# `since` narrows the request to rows on or after that date, for incremental refreshes
+def fetch_crashes(days=MAX_DAYS, since=None):
+    days_ago_str = since or window_start(days)
+
+    params = {
+        "$select": ", ".join(SELECT_FIELDS),
+        "$where": f"(number_of_cyclist_injured > 0 OR number_of_cyclist_killed > 0) AND crash_date >= '{days_ago_str}'",
+        # oldest first: rows added upstream while the pages are fetched then mostly land
+        # after the last offset instead of shifting every page
+        "$order": "crash_date",
     }
-    response_injured = requests.get(base_url, params=params_injured)
-    NYC_BIKE_API_LINK_INJURED = pd.DataFrame(response_injured.json())
-    NYC_BIKE_API_LINK_INJURED = NYC_BIKE_API_LINK_INJURED.dropna(subset=['borough', 'latitude', 'longitude']).reset_index(drop=True)
-    NYC_BIKE_API_LINK_INJURED["crash_date"] = pd.to_datetime(
-        NYC_BIKE_API_LINK_INJURED["crash_date"]
+    with metrics.stage("fetch"):
+        crashes = concat_pages(fetch_pages(params))
+    # a late report for an earlier day still shifts the pages after it by a row, which
+    # then shows up at the end of one page and the start of the next
+    crashes = crashes.drop_duplicates("collision_id", ignore_index=True)
+    crashes = crashes.rename(columns=COLUMN_NAMES)[CRASH_COLUMNS]
+    crashes["Borough"] = crashes["Borough"].cat.rename_categories(str.title)
+    logger.info(
+        "crash frame: %d rows, %.2f MB", len(crashes), frame_memory_mb(crashes)
     )
-    NYC_BIKE_API_LINK_INJURED = NYC_BIKE_API_LINK_INJURED.rename(
-        columns={
-            "crash_date": "Date",
-            "borough": "Borough",
-            "latitude": "Latitude",
-            "longitude": "Longitude",
-            "number_of_cyclist_injured": "Cyclists_Injured",
-            "number_of_cyclist_killed": "Cyclists_Killed",
-            "vehicle_type_code1": "Vehicle_1",
-            "vehicle_type_code2": "Vehicle_2",
-            "contributing_factor_vehicle_1": "Contributing_Factor",
-        }
+
+    return crashes
+
+
+# Same split the two separate queries used to make: any death puts a crash in the
+# killed frame, otherwise it is an injury crash
+def split_crashes(crashes):
+    killed_mask = crashes["Cyclists_Killed"] > 0
+    injured_mask = (crashes["Cyclists_Injured"] > 0) & ~killed_mask
+
+    injured = crashes[injured_mask].reset_index(drop=True)
+    killed = crashes[killed_mask].reset_index(drop=True)
+    return injured, killed
+
+
+# Returns the window from the on-disk cache, asking the API only for rows newer than
+# the cached high-water mark. A fresh enough cache is returned without any request.
+def refresh_crash_data(days=MAX_DAYS, max_age=crash_store.CACHE_MAX_AGE_SECONDS):
+    cached = crash_store.load(days, CRASH_COLUMNS)
+    if cached is None:
+        crashes = fetch_crashes(days)
+        crash_store.save(days, crashes)
+        injured, killed = split_crashes(crashes)
+        crash_store.save_rollups(days, rollups.daily_rollups(injured, killed))
+        return injured, killed
+
+    age = crash_store.cache_age(days)
+    if age is not None and age < max_age:
+        return split_crashes(cached)
+
+    # re-request the high-water day itself, late reports for it may have arrived since
+    high_water = cached["crash_date"].max()
+    if pd.isna(high_water):
+        since = None
+    else:
+        since = high_water.strftime("%Y-%m-%d")
+    new_crashes = fetch_crashes(days, since=since)
+    logger.info("crash cache: %d new rows since %s", len(new_crashes), since)
+
+    # fresh rows replace cached copies, which also picks up injured -> killed updates
+    # (concatenating categoricals with different categories falls back to object)
+    crashes = crash_store.merge(cached, new_crashes).astype(SCHEMA)
+    start = pd.Timestamp(window_start(days))
+    crashes = crashes[crashes["crash_date"] >= start].reset_index(drop=True)
+    crash_store.save(days, crashes)
+
+    injured, killed = split_crashes(crashes)
+    crash_rollups = load_rollups(days)
+    if crash_rollups is None or since is None:
+        crash_rollups = rollups.daily_rollups(injured, killed)
+    else:
+        crash_rollups = rollups.update_rollups(
+            crash_rollups, injured, killed, pd.Timestamp(since), start
+        )
+    crash_store.save_rollups(days, crash_rollups)
+    return injured, killed
+
+
+def load_rollups(days=MAX_DAYS):
+    return crash_store.load_rollups(days, list(rollups.DIMENSIONS) + ["totals"])
+
+
+# One shared copy of the widest window, fetched on first use rather than at import.
+# Narrower windows are sliced from it in memory. The refresher thread replaces the
+# whole tuple in a single assignment, so readers see either the old or the new data.
+CrashData = namedtuple(
+    "CrashData",
+    [
+        "injured",
+        "killed",
+        "rollups",
+        "cumulative_totals",
+        "injured_index",
+        "as_of",
+        "version",
+    ],
+)
+
+_crash_data = None
+_crash_data_lock = threading.Lock()
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+# Display strings for the figures are built once per load, not on every callback
+def add_display_columns(df):
+    # one string per day, shared across that day's rows
+    df["crash_date_str"] = df["crash_date"].dt.strftime("%m/%d/%Y").astype("category")
+
+
+def add_killed_hover_text(df):
+    # categoricals don't support string concatenation; object keeps missing values NaN
+    df["hover_txt"] = (
+        "<b>Borough: </b>"
+        + df["Borough"].astype(object)
+        + "<br>"
+        + "<br>"
+        + "Date: "
+        + df["crash_date_str"].astype(object)
+        + "<br>"
+        + "Cyclists Killed: "
+        + df["Cyclists_Killed"].astype(str)
+        + "<br>"
+        "Vehicle 1: "
+        + df["Vehicle_1"].astype(object)
+        + "<br>"
+        + "Vehicle 2: "
+        + df["Vehicle_2"].astype(object)
+        + "<br>"
+        + "Contributing Factor: "
+        + df["Contributing_Factor"].astype(object)
     )
 
-    # Create Deaths variable
-    params_killed = {
-        "$select": "crash_date, borough, latitude, longitude, number_of_cyclist_injured, number_of_cyclist_killed, contributing_factor_vehicle_1, vehicle_type_code1, vehicle_type_code2",
-        "$where": f"number_of_cyclist_killed > 0 AND crash_date >= '{days_ago_str}'",
-        "$order": "crash_date DESC",
-    }
-    response_killed = requests.get(base_url, params=params_killed)
-    NYC_BIKE_API_LINK_KILLED = pd.DataFrame(response_killed.json())
-    NYC_BIKE_API_LINK_KILLED = NYC_BIKE_API_LINK_KILLED.dropna(subset=['borough', 'latitude', 'longitude']).reset_index(drop=True)
-    NYC_BIKE_API_LINK_KILLED["crash_date"] = pd.to_datetime(
-        NYC_BIKE_API_LINK_KILLED["crash_date"]
+
+# Sorted, display-ready frames as stored in the shared dataset files
+def prepare_crash_frames(injured, killed):
+    # oldest first, so a window is always a tail of the frame (see filter_dataframe_by_days)
+    injured = injured.sort_values("crash_date", kind="stable", ignore_index=True)
+    killed = killed.sort_values("crash_date", kind="stable", ignore_index=True)
+    add_display_columns(injured)
+    add_display_columns(killed)
+    with metrics.stage("hover_text"):
+        add_killed_hover_text(killed)
+    return injured, killed
+
+
+PREPARED_COLUMNS = (
+    CRASH_COLUMNS + ["crash_date_str"],
+    CRASH_COLUMNS + ["crash_date_str", "hover_txt"],
+)
+
+
+def _load_dataset(max_age):
+    dataset = crash_store.load_dataset(MAX_DAYS, max_age)
+    if dataset is None:
+        return None
+    # files written by an older version of the app are rebuilt
+    if [list(df.columns) for df in dataset] != list(PREPARED_COLUMNS):
+        return None
+    return dataset
+
+
+# Workers memory-map one prepared copy of the data from disk instead of each building
+# their own. The first process to find it missing or stale rebuilds it under a file
+# lock while the others wait, then map the new files.
+def load_prepared_crash_data(max_age=crash_store.CACHE_MAX_AGE_SECONDS):
+    dataset = _load_dataset(max_age)
+    if dataset is not None:
+        return dataset
+
+    with crash_store.build_lock(MAX_DAYS):
+        dataset = _load_dataset(max_age)
+        if dataset is not None:
+            return dataset
+        with metrics.stage("refresh"):
+            crashes = refresh_crash_data(MAX_DAYS, max_age=max_age)
+        with metrics.stage("prepare"):
+            injured, killed = prepare_crash_frames(*crashes)
+        crash_store.save_dataset(MAX_DAYS, injured, killed)
+
+    # map what was just written as well, so this worker shares those pages too
+    return _load_dataset(float("inf")) or (injured, killed)
+
+
+def build_crash_data(max_age=crash_store.CACHE_MAX_AGE_SECONDS):
+    injured, killed = load_prepared_crash_data(max_age)
+    crash_rollups = load_rollups()
+    if crash_rollups is None:
+        crash_rollups = rollups.daily_rollups(injured, killed)
+    # the histogram draws every borough, with or without crashes
+    crash_rollups["borough"] = crash_rollups["borough"].reindex(
+        columns=list(BOROUGH_COLORS), fill_value=0
+    )
+    cumulative = rollups.cumulative_totals(crash_rollups["totals"])
+    injured_index = geo.GridIndex(
+        injured["Latitude"], injured["Longitude"], VIEWPORT_INDEX_DEGREES
     )
-    NYC_BIKE_API_LINK_KILLED = NYC_BIKE_API_LINK_KILLED.rename(
-        columns={
-            "crash_date": "Date",
-            "borough": "Borough",
-            "latitude": "Latitude",
-            "longitude": "Longitude",
-            "number_of_cyclist_injured": "Cyclists_Injured",
-            "number_of_cyclist_killed": "Cyclists_Killed",
-            "vehicle_type_code1": "Vehicle_1",
-            "vehicle_type_code2": "Vehicle_2",
-            "contributing_factor_vehicle_1": "Contributing_Factor",
-        }
+
+    # when the rows were last pulled from the API, by this or another worker. Reloading
+    # an unchanged cache keeps the same version, so derived caches stay valid.
+    modified = crash_store.cache_mtime(MAX_DAYS)
+    as_of = datetime.fromtimestamp(modified) if modified else datetime.now()
+    version = as_of.strftime("%Y%m%d%H%M%S%f")
+    return CrashData(
+        injured, killed, crash_rollups, cumulative, injured_index, as_of, version
     )
 
-    NYC_BIKE_API_LINK_INJURED["Borough"] = NYC_BIKE_API_LINK_INJURED["Borough"].str.title()
-    NYC_BIKE_API_LINK_KILLED["Borough"] = NYC_BIKE_API_LINK_KILLED["Borough"].str.title()
-    
-    return NYC_BIKE_API_LINK_INJURED, NYC_BIKE_API_LINK_KILLED
-NYC_BIKE_API_LINK_INJURED, NYC_BIKE_API_LINK_KILLED = get_crash_data()
+
+# Loads the data without starting the refresher, e.g. in the gunicorn master before it
+# forks workers (see gunicorn.conf.py)
+def prime_crash_data():
+    global _crash_data
+
+    if _crash_data is None:
+        with _crash_data_lock:
+            if _crash_data is None:
+                _crash_data = build_crash_data()
+
+    return _crash_data
+
+
+def load_crash_data():
+    crash_data = prime_crash_data()
+    start_refresher()
+    return crash_data
+
+
+def data_loaded():
+    return _crash_data is not None
+
+
+def data_version():
+    crash_data = _crash_data
+    return crash_data.version if crash_data is not None else None
+
+
+def _load_in_background():
+    try:
+        load_crash_data()
+    except Exception:
+        # the first callback tries again
+        logger.exception("background crash data load failed")
+
+
+# Fast startup: the server answers right away while the first load runs on a thread;
+# callbacks that arrive before it finishes wait for it in prime_crash_data
+def start_background_load():
+    threading.Thread(
+        target=_load_in_background, name="crash-data-loader", daemon=True
+    ).start()
+
+
+def _refresh_forever(interval):
+    global _crash_data
+
+    while True:
+        time.sleep(interval)
+        try:
+            _crash_data = build_crash_data(max_age=interval)
+        except Exception:
+            # keep serving the previous data and try again next interval
+            logger.exception("crash data refresh failed")
+
+
+def start_refresher(interval=REFRESH_INTERVAL_SECONDS):
+    global _refresher
+
+    if interval <= 0 or _refresher is not None:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(
+                target=_refresh_forever,
+                args=(interval,),
+                name="crash-data-refresher",
+                daemon=True,
+            )
+            _refresher.start()
+
+
+# Threads and locks don't survive a fork; a forked worker keeps the inherited data but
+# starts its own refresher on first use
+def _reset_after_fork():
+    global _crash_data_lock, _refresher, _refresher_lock
+
+    _crash_data_lock = threading.Lock()
+    _refresher = None
+    _refresher_lock = threading.Lock()
 
 
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,150 @@
+import os
+import time
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, fine for the dev server
+    fcntl = None
+
+
+# Feather (Arrow IPC) files keyed by query window, e.g. .cache/crashes_60d.feather,
+# plus the prepared dataset files built from them
+CACHE_DIR = os.environ.get(
+    "CRASH_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+# A cache younger than this is used as-is on startup, without asking the API for new rows
+CACHE_MAX_AGE_SECONDS = int(os.environ.get("CRASH_CACHE_MAX_AGE_SECONDS", 60 * 60))
+
+
+def cache_path(days):
+    return os.path.join(CACHE_DIR, f"crashes_{days}d.feather")
+
+
+def cache_mtime(days):
+    # when the window was last written, or None if it was never cached
+    try:
+        return os.path.getmtime(cache_path(days))
+    except OSError:
+        return None
+
+
+def cache_age(days):
+    modified = cache_mtime(days)
+    if modified is None:
+        return None
+    return time.time() - modified
+
+
+def load(days, columns):
+    try:
+        crashes = pd.read_feather(cache_path(days))
+    except Exception:
+        # missing or unreadable cache: the caller falls back to a full fetch
+        return None
+    if list(crashes.columns) != list(columns):
+        # written by an older version of the app with a different schema
+        return None
+    return crashes
+
+
+def save(days, crashes):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(days)
+    # write then rename, so concurrent workers never read a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    crashes.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def merge(cached, fresh, key="collision_id"):
+    # fresh rows win over cached copies of the same crash
+    merged = pd.concat([cached, fresh], ignore_index=True)
+    return merged.drop_duplicates(subset=key, keep="last").reset_index(drop=True)
+
+
+# Daily rollups kept next to the raw cache and updated with it, e.g.
+# .cache/rollup_60d_borough.feather
+def rollup_path(days, name):
+    return os.path.join(CACHE_DIR, f"rollup_{days}d_{name}.feather")
+
+
+def load_rollups(days, names):
+    try:
+        return {
+            name: pd.read_feather(rollup_path(days, name)).set_index("crash_date")
+            for name in names
+        }
+    except Exception:
+        # missing or unreadable: the caller rolls the raw rows up again
+        return None
+
+
+def save_rollups(days, rollups):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for name, frame in rollups.items():
+        path = rollup_path(days, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.reset_index().to_feather(tmp_path)
+        os.replace(tmp_path, path)
+
+
+# Prepared injured/killed frames shared by every worker, e.g. .cache/dataset_60d_killed.arrow
+def dataset_path(days, kind):
+    return os.path.join(CACHE_DIR, f"dataset_{days}d_{kind}.arrow")
+
+
+def dataset_mtime(days):
+    try:
+        return min(
+            os.path.getmtime(dataset_path(days, kind)) for kind in ("injured", "killed")
+        )
+    except OSError:
+        return None
+
+
+def save_dataset(days, injured, killed):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for kind, df in (("injured", injured), ("killed", killed)):
+        path = dataset_path(days, kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # uncompressed and in a single record batch, so readers can map columns
+        # straight from the file instead of decompressing or concatenating chunks
+        df.reset_index(drop=True).to_feather(
+            tmp_path, compression="uncompressed", chunksize=max(len(df), 1)
+        )
+        # replacing the file leaves the old one mapped for readers still using it
+        os.replace(tmp_path, path)
+
+
+# Memory-mapped frames: numeric, date and categorical columns point straight into the
+# OS page cache, which every process mapping the same file shares. They are read-only.
+def load_dataset(days, max_age):
+    modified = dataset_mtime(days)
+    if modified is None or time.time() - modified >= max_age:
+        return None
+    try:
+        return tuple(
+            feather.read_table(dataset_path(days, kind), memory_map=True).to_pandas(
+                split_blocks=True, self_destruct=True
+            )
+            for kind in ("injured", "killed")
+        )
+    except Exception:
+        return None
+
+
+@contextmanager
+def build_lock(days):
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, f"dataset_{days}d.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
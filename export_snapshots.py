@@ -0,0 +1,83 @@
+"""Prebuild every (view, days) window of the dashboard for snapshot mode.
+
+    python export_snapshots.py [--out snapshots/]
+
+Writes one gzipped JSON file per window with all of update_all's outputs, plus a
+manifest.json describing the data they were built from. Run it after each data refresh,
+then serve the app with SERVE_SNAPSHOTS=1 (see snapshots.py).
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from plotly.io.json import to_json_plotly
+import constants
+import main
+import snapshots
+
+
+def window_outputs(crash_data, view, days):
+    df, df_killed = main.window_frames(crash_data, days)
+    return {
+        "map": main.build_map_fig(view, df, df_killed, days),
+        "histogram": main.create_histogram_fig(crash_data.rollups["borough"], days),
+        "totals": main.window_totals_data(crash_data),
+    }
+
+
+def export(out_dir, crash_data):
+    # built next to the output and swapped in whole, so the app never serves a mix of
+    # old and new windows
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=".snapshots-", dir=parent)
+    os.chmod(build_dir, 0o755)
+
+    files = {}
+    for view in snapshots.VIEWS:
+        for days in range(7, constants.MAX_DAYS + 1):
+            name = snapshots.snapshot_name(view, days)
+            data = to_json_plotly(window_outputs(crash_data, view, days)).encode()
+            path = os.path.join(build_dir, f"{name}.gz")
+            with gzip.open(path, "wb", compresslevel=6) as f:
+                f.write(data)
+            files[name] = len(data)
+
+    manifest = {
+        "version": crash_data.version,
+        "as_of": crash_data.as_of.isoformat(),
+        "generated": datetime.now().isoformat(),
+        "views": list(snapshots.VIEWS),
+        "min_days": 7,
+        "max_days": constants.MAX_DAYS,
+        "files": files,
+    }
+    with open(os.path.join(build_dir, snapshots.MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = f"{out_dir}.old"
+    # left behind by an export that was interrupted mid-swap
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(build_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=snapshots.SNAPSHOT_DIR, help="output directory")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    manifest = export(args.out, constants.build_crash_data())
+    print(
+        f"wrote {len(manifest['files'])} snapshots of data version "
+        f"{manifest['version']} to {args.out}"
+    )
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+# Snaps points to a fixed lat/lon grid of `resolution` degrees and returns one centroid
+# per occupied cell, weighted by how many points fell in it. Cost is a single sort, and
+# the output size depends on the area covered rather than the number of points.
+def bin_points(lat, lon, resolution):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.size == 0:
+        return lat, lon, np.zeros(0, dtype=np.int64)
+
+    row = np.floor(lat / resolution).astype(np.int64)
+    col = np.floor(lon / resolution).astype(np.int64)
+    row -= row.min()
+    col -= col.min()
+    cell = row * (col.max() + 1) + col
+
+    _, cell_index, counts = np.unique(cell, return_inverse=True, return_counts=True)
+    cell_index = cell_index.ravel()
+    centroid_lat = np.bincount(cell_index, weights=lat) / counts
+    centroid_lon = np.bincount(cell_index, weights=lon) / counts
+    return centroid_lat, centroid_lon, counts
+
+
+# Buckets row positions by grid cell so a bounding box maps to a few contiguous ranges
+# of one sorted array, one range per grid row, instead of a scan over every point
+class GridIndex:
+    def __init__(self, lat, lon, cell_degrees):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.cell_degrees = cell_degrees
+        self.size = lat.size
+        if self.size == 0:
+            self.order = np.zeros(0, dtype=np.int64)
+            return
+
+        self.lat_origin = lat.min()
+        self.lon_origin = lon.min()
+        rows = self._cell(lat, self.lat_origin)
+        cols = self._cell(lon, self.lon_origin)
+        self.n_rows = rows.max() + 1
+        self.n_cols = cols.max() + 1
+
+        # stable, so positions within a cell stay in frame (date) order
+        self.order = np.argsort(rows * self.n_cols + cols, kind="stable")
+        self.keys = (rows * self.n_cols + cols)[self.order]
+
+    def _cell(self, values, origin):
+        return np.floor((np.asarray(values) - origin) / self.cell_degrees).astype(np.int64)
+
+    # Sorted positions of the points in every cell the box touches, so a few points just
+    # outside the box may be included
+    def query(self, south, west, north, east):
+        if self.size == 0:
+            return self.order
+
+        first_row, last_row = self._cell([south, north], self.lat_origin)
+        first_col, last_col = self._cell([west, east], self.lon_origin)
+        if (
+            last_row < 0
+            or last_col < 0
+            or first_row >= self.n_rows
+            or first_col >= self.n_cols
+            or first_row > last_row
+            or first_col > last_col
+        ):
+            return self.order[:0]
+        first_row, last_row = max(first_row, 0), min(last_row, self.n_rows - 1)
+        first_col, last_col = max(first_col, 0), min(last_col, self.n_cols - 1)
+
+        rows = np.arange(first_row, last_row + 1)
+        starts = np.searchsorted(self.keys, rows * self.n_cols + first_col, side="left")
+        ends = np.searchsorted(self.keys, rows * self.n_cols + last_col, side="right")
+        positions = np.concatenate(
+            [self.order[start:end] for start, end in zip(starts, ends)]
+        )
+        return np.sort(positions)
@@ -0,0 +1,20 @@
+# Read by gunicorn when started from this directory, e.g. `gunicorn main:server`
+import constants
+
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+
+
+def when_ready(server):
+    # Load the crash data before any worker forks. Workers inherit the memory-mapped
+    # frames instead of each fetching and building their own copy.
+    if not constants.FAST_STARTUP:
+        constants.prime_crash_data()
+
+
+def post_fork(server, worker):
+    # FAST_STARTUP=1: workers start serving at once and load in the background. Only one
+    # of them builds the dataset files, the others wait for them and map the same pages.
+    if constants.FAST_STARTUP:
+        constants.start_background_load()
@@ -1,37 +1,116 @@
-from dash import Dash, dcc, html, Input, Output, callback, callback_context
-import plotly.express as px
+from dash import (
+    Dash,
+    dcc,
+    html,
+    Input,
+    Output,
+    State,
+    Patch,
+    ClientsideFunction,
+    callback_context,
+    ctx,
+    no_update,
+)
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+import numpy as np
 import dash_bootstrap_components as dbc
 import plotly.io as pio
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+import re
+import threading
+import coalesce
+import compression
 import constants
+import geo
+import metrics
+import response_cache
+import rollups
+import snapshots
 from constants import (
-    DAYS,
+    MAX_DAYS,
     BOROUGH_COLORS,
-    NYC_BIKE_API_LINK_INJURED,
-    NYC_BIKE_API_LINK_KILLED,
+    DENSITY_BINNING_MIN_POINTS,
+    DENSITY_BIN_DEGREES,
+    VIEWPORT_LOADING,
+    VIEWPORT_MAX_POINTS,
 )
 
 
-MAX_DAYS = 60
-FULL_DF_INJURED, FULL_DF_KILLED = constants.get_crash_data(MAX_DAYS)
-FULL_DF_INJURED["crash_date"] = pd.to_datetime(FULL_DF_INJURED["Date"])
-FULL_DF_KILLED["crash_date"] = pd.to_datetime(FULL_DF_KILLED["Date"])
-
-
-def filter_dataframe_by_days(df, days):
+# Crash frames are sorted by crash_date when loaded, so the newest date is the last row
+# and the window start is a binary search. The positional slice is a view, not a copy.
+# Windows end on `max_date` when given, otherwise on the frame's own newest date.
+def filter_dataframe_by_days(df, days, max_date=None):
     if df.empty:
         return df
 
-    max_date = df["crash_date"].max()
+    crash_dates = df["crash_date"]
+    if max_date is None:
+        max_date = crash_dates.iloc[-1]
     cutoff_date = max_date - timedelta(days=days - 1)
-    filtered_df = df[df["crash_date"] >= cutoff_date].copy()
-    return filtered_df
+    start = crash_dates.searchsorted(cutoff_date, side="left")
+    return df.iloc[start:]
+
+
+# Injured and killed windows both end on the newest day of either frame, the last day of
+# the rollups, so the markers drawn match the counts in the text
+def window_frames(crash_data, days):
+    rollup_days = crash_data.rollups["totals"].index
+    max_date = rollup_days[-1] if len(rollup_days) else None
+    return (
+        filter_dataframe_by_days(crash_data.injured, days, max_date),
+        filter_dataframe_by_days(crash_data.killed, days, max_date),
+    )
+
+
+# plotly express and the dark template take about half a second to load, so the first
+# figure build pays for them instead of every server start
+@lru_cache(maxsize=None)
+def plotly_express():
+    import plotly.express as px
+
+    pio.templates.default = "plotly_dark"
+    return px
+
+
+# shown until the initial update_all call fills the graphs; transparent so the dark page
+# doesn't flash white axes
+PLACEHOLDER_FIGURE = {
+    "layout": {
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+    }
+}
+
+
+# Week, month and longer marks, up to the widest window
+SLIDER_MARKS = {
+    7: "Week",
+    30: "Month",
+    60: "2 Months",
+    182: "6 Months",
+    365: "Year",
+    730: "2 Years",
+    1095: "3 Years",
+    1825: "5 Years",
+}
+
+
+def slider_marks(max_days):
+    return {
+        days: {
+            "label": label,
+            "style": {"font-size": "10px", "white-space": "nowrap"},
+        }
+        for days, label in SLIDER_MARKS.items()
+        if days <= max_days
+    }
 
 
-pio.templates.default = "plotly_dark"
 app = Dash(
     __name__,
     title="NYC Bike Crashes",
@@ -42,17 +121,50 @@ app = Dash(
     ],
 )
 server = app.server
+compression.init_app(server, app.config.routes_pathname_prefix)
+metrics.init_app(server, app.config.routes_pathname_prefix)
+response_cache.init_app(
+    server, constants.data_version, app.config.routes_pathname_prefix
+)
+snapshots.init_app(server, app.config.routes_pathname_prefix)
+
 
-df = constants.NYC_BIKE_API_LINK_INJURED
-df["crash_date"] = pd.to_datetime(df["Date"])
+# Answers as soon as the server is up, also while the crash data is still loading
+@server.route("/healthz")
+def healthz():
+    return {"status": "ok", "data_loaded": constants.data_loaded()}
 
 
-# Density fig is a scatter map with opaque traces for tooltips and Go density traces added on top
-def create_density_fig(df, DAYS, BOROUGH_COLORS):
-    df["crash_date_str"] = df["Date"].dt.strftime("%m/%d/%Y")
+CUSTOMDATA_REF = re.compile(r"customdata\[(\d+)\]")
 
+
+# px puts every hover_data column in customdata, hidden ones (full-precision lat/lon,
+# borough) included, and repeats hover_name on every point of a trace. Keep only the
+# columns the hover template reads, and send a value shared by a whole trace once.
+def compact_hover_data(fig):
+    for trace in fig.data:
+        template = getattr(trace, "hovertemplate", None)
+        if trace.customdata is not None and template:
+            used = sorted({int(i) for i in CUSTOMDATA_REF.findall(template)})
+            trace.customdata = np.asarray(trace.customdata)[:, used]
+            trace.hovertemplate = CUSTOMDATA_REF.sub(
+                lambda m: f"customdata[{used.index(int(m.group(1)))}]", template
+            )
+        hovertext = trace.hovertext
+        if hovertext is not None and not isinstance(hovertext, str) and len(hovertext):
+            hovertext = np.asarray(hovertext, dtype=object)
+            if (hovertext == hovertext[0]).all():
+                trace.hovertext = hovertext[0]
+    return fig
+
+
+# Density fig is a scatter map with opaque traces for tooltips and Go density traces added on top.
+# Large windows skip the per-crash tooltip traces and draw the density from weighted grid cells.
+def create_density_fig(df, df_killed, DAYS, BOROUGH_COLORS):
+    px = plotly_express()
+    binned = len(df) >= DENSITY_BINNING_MIN_POINTS
     density_fig = px.scatter_map(
-        df,
+        df.iloc[:0] if binned else df,
         lat="Latitude",
         lon="Longitude",
         color_discrete_map=BOROUGH_COLORS,
@@ -82,18 +194,35 @@ def create_density_fig(df, DAYS, BOROUGH_COLORS):
     for trace in density_fig.data[:-1]:
         trace.marker.opacity = 0
 
-    density_fig.add_trace(
-        go.Densitymap(
+    if binned:
+        lat, lon, weights = geo.bin_points(
+            df["Latitude"], df["Longitude"], DENSITY_BIN_DEGREES
+        )
+        # float32 keeps ~1 m of precision at half the bytes of the float64 centroids
+        density_trace = go.Densitymap(
+            lat=lat.astype(np.float32),
+            lon=lon.astype(np.float32),
+            z=weights,
+            hovertemplate="%{z:,} cyclist injury reports<extra></extra>",
+            # plotly maps z from zmin..zmax onto a point weight of 0..1 and clamps, so
+            # the range spans the cell counts; the busiest 1% of cells weigh the most
+            zmin=0,
+            zmax=max(np.percentile(weights, 99), 1),
+        )
+    else:
+        density_trace = go.Densitymap(
             lat=df["Latitude"],
             lon=df["Longitude"],
             hoverinfo="skip",
-            radius=10,
-            opacity=0.90,
             zmin=0.55,
             zmax=1,
-            showscale=False,
         )
+    density_trace.update(
+        radius=10,
+        opacity=0.90,
+        showscale=False,
     )
+    density_fig.add_trace(density_trace)
 
     density_fig.update_layout(
         margin=dict(l=30, r=20, t=75, b=30),
@@ -110,6 +239,7 @@ def create_density_fig(df, DAYS, BOROUGH_COLORS):
             "yanchor": "top",
         },
         showlegend=False,
+        uirevision="map",
         paper_bgcolor="rgba(0,0,0,0)",
         plot_bgcolor="rgba(0,0,0,0)",
         annotations=[
@@ -129,41 +259,21 @@ def create_density_fig(df, DAYS, BOROUGH_COLORS):
             )
         ],
     )
-    hover_txt = (
-        "<b>Borough: </b>"
-        + FULL_DF_KILLED["Borough"]
-        + "<br>"
-        + "<br>"
-        + "Date: "
-        + FULL_DF_KILLED["Date"].dt.strftime("%m/%d/%Y")
-        + "<br>"
-        + "Cyclists Killed: "
-        + FULL_DF_KILLED["Cyclists_Killed"].astype(str)
-        + "<br>"
-        "Vehicle 1: "
-        + FULL_DF_KILLED["Vehicle_1"]
-        + "<br>"
-        + "Vehicle 2: "
-        + FULL_DF_KILLED["Vehicle_2"]
-        + "<br>"
-        + "Contributing Factor: "
-        + FULL_DF_KILLED["Contributing_Factor"]
-    )
     density_fig.add_scattermap(
-        lat=FULL_DF_KILLED["Latitude"],
-        lon=FULL_DF_KILLED["Longitude"],
+        lat=df_killed["Latitude"],
+        lon=df_killed["Longitude"],
         mode="markers",
         marker=dict(symbol="circle", size=10, color="#FFFFFF"),
         hoverinfo="text",
-        hovertext=hover_txt,
+        hovertext=df_killed["hover_txt"],
         opacity=1,
     )
 
-    return density_fig
+    return compact_hover_data(density_fig)
 
 
-def create_scatter_fig(df, DAYS):
-    df["crash_date_str"] = df["Date"].dt.strftime("%m/%d/%Y")
+def create_scatter_fig(df, df_killed, DAYS):
+    px = plotly_express()
     scatter_fig = px.scatter_map(
         df,
         lat="Latitude",
@@ -212,6 +322,7 @@ def create_scatter_fig(df, DAYS):
             "yanchor": "top",
         },
         showlegend=False,
+        uirevision="map",
         paper_bgcolor="rgba(0,0,0,0)",
         plot_bgcolor="rgba(0,0,0,0)",
         annotations=[
@@ -232,64 +343,38 @@ def create_scatter_fig(df, DAYS):
         ],
     )
 
-    hover_txt = (
-        "<b>Borough: </b>"
-        + FULL_DF_KILLED["Borough"]
-        + "<br>"
-        + "<br>"
-        + "Date: "
-        + FULL_DF_KILLED["Date"].dt.strftime("%m/%d/%Y")
-        + "<br>"
-        + "Cyclists Killed: "
-        + FULL_DF_KILLED["Cyclists_Killed"].astype(str)
-        + "<br>"
-        "Vehicle 1: "
-        + FULL_DF_KILLED["Vehicle_1"]
-        + "<br>"
-        + "Vehicle 2: "
-        + FULL_DF_KILLED["Vehicle_2"]
-        + "<br>"
-        + "Contributing Factor: "
-        + FULL_DF_KILLED["Contributing_Factor"]
-    )
     scatter_fig.add_scattermap(
-        lat=FULL_DF_KILLED["Latitude"],
-        lon=FULL_DF_KILLED["Longitude"],
+        lat=df_killed["Latitude"],
+        lon=df_killed["Longitude"],
         mode="markers",
         marker=dict(symbol="circle", size=10, color="#FFFFFF"),
         hoverinfo="text",
-        hovertext=hover_txt,
+        hovertext=df_killed["hover_txt"],
         opacity=1,
     )
 
-    return scatter_fig
-
-
-def create_histogram_fig(df, DAYS):
-    ordered_boroughs = list(BOROUGH_COLORS.keys())
-    df["Borough"] = pd.Categorical(
-        df["Borough"], categories=ordered_boroughs, ordered=True
-    )
-    df = df.sort_values("Borough")
-    histogram_fig = px.histogram(
-        df,
-        x="Date",
-        y="Cyclists_Injured",
-        color_discrete_map=BOROUGH_COLORS,
-        color="Borough",
-        hover_data={
-            "Borough": True,
-            "crash_date_str": True,
-            "Cyclists_Injured": True,
-        },
-        labels={
-            "crash_date_str": " ",
-            "borough": "Borough ",
-            "Cyclists_Injured": "Borough Cyclists Injured",
-        },
-        nbins=DAYS,
-        title="",
-    )
+    return compact_hover_data(scatter_fig)
+
+
+# Stacked daily bars drawn from the pre-aggregated day x borough table, so only
+# DAYS x 5 values are sent to the browser instead of every crash row
+def create_histogram_fig(daily_injured, DAYS):
+    daily_injured = daily_injured.tail(DAYS)
+    plotly_express()  # sets the dark template
+    histogram_fig = go.Figure()
+    for borough in BOROUGH_COLORS:
+        histogram_fig.add_bar(
+            x=daily_injured.index,
+            y=daily_injured[borough],
+            name=borough,
+            legendgroup=borough,
+            marker_color=BOROUGH_COLORS[borough],
+            hovertemplate=(
+                f"Borough={borough}<br>%{{x|%m/%d/%Y}}<br>"
+                "Borough Cyclists Injured=%{y}<extra></extra>"
+            ),
+        )
+    histogram_fig.update_layout(barmode="stack")
     histogram_fig.update_layout(
         margin=dict(l=80, r=20, t=30, b=5),
         bargap=0.1,
@@ -316,10 +401,6 @@ def create_histogram_fig(df, DAYS):
     return histogram_fig
 
 
-density_fig = create_density_fig(df, DAYS, BOROUGH_COLORS)
-scatter_fig = create_scatter_fig(df, DAYS)
-histogram_fig = create_histogram_fig(df, DAYS)
-
 attribution_button = dbc.Button(
     "About This Project",
     id="open-attribution",
@@ -428,25 +509,11 @@ app.layout = html.Div(
                                             max=MAX_DAYS,
                                             step=1,
                                             value=30,
-                                            marks={
-                                                7: {
-                                                    "label": "Week",
-                                                    "style": {"font-size": "10px"},
-                                                },
-                                                30: {
-                                                    "label": "Month",
-                                                    "style": {"font-size": "10px"},
-                                                },
-                                                60: {
-                                                    "label": "2 Months",
-                                                    "style": {
-                                                        "font-size": "10px",
-                                                        "white-space": "nowrap",
-                                                    },
-                                                },
-                                            },
+                                            marks=slider_marks(MAX_DAYS),
                                             id="slider",
-                                            updatemode="drag",
+                                            # figures follow on release; the label
+                                            # and count follow drag_value (slider.js)
+                                            updatemode="mouseup",
                                         ),
                                     ],
                                     style={
@@ -509,7 +576,7 @@ app.layout = html.Div(
                                     [
                                         dcc.Graph(
                                             id="map",
-                                            figure=density_fig,
+                                            figure=PLACEHOLDER_FIGURE,
                                             responsive=True,
                                             style={"height": "65vh"},
                                         )
@@ -519,7 +586,7 @@ app.layout = html.Div(
                                     [
                                         dcc.Graph(
                                             id="histogram",
-                                            figure=histogram_fig,
+                                            figure=PLACEHOLDER_FIGURE,
                                             responsive=True,
                                             style={
                                                 "height": "35vh",
@@ -542,54 +609,216 @@ app.layout = html.Div(
             className="bg-black bg-opacity-50",
         ),
         attribution_modal,
+        dcc.Store(id="snapshot-url", data=snapshots.SNAPSHOT_URL),
+        dcc.Store(id="window-totals"),
+        dcc.Store(id="window-totals-version"),
+        dcc.Store(id="session-id"),
     ],
 )
 
 
-@app.callback(
-    Output("map", "figure"),
-    Output("histogram", "figure"),
-    Output("slider-label", "children"),
-    Output("crash-count", "children"),
-    Input("dropdown", "value"),
-    Input("slider", "value"),
-)
-def update_all(selected_value, slider_value):
-    global FULL_DF_KILLED
-
-    df = filter_dataframe_by_days(FULL_DF_INJURED, slider_value)
-    df_killed = filter_dataframe_by_days(FULL_DF_KILLED, slider_value)
-
-    # temporarily replace the module‑level killed dataframe
-    _original_killed = FULL_DF_KILLED  # save the full set
-    FULL_DF_KILLED = df_killed  # swap in the filtered set
+# The builders only read their frames, so concurrent callbacks can share them
+def build_map_fig(selected_value, df, df_killed, slider_value):
+    if selected_value == "density":
+        return create_density_fig(df, df_killed, slider_value, BOROUGH_COLORS)
+    return create_scatter_fig(df, df_killed, slider_value)
+
+
+# The slider fires on every drag tick, but with the default 60 days there are only 54
+# windows x (2 map views + histogram) per data version, so built figures are kept in a
+# small LRU cache. Keys end with the data version. Long histories keep the most recent.
+FIGURE_CACHE_SIZE = 3 * (min(MAX_DAYS, 60) - 7 + 1)
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def cached_figure(key, build):
+    with _figure_cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+
+    fig = build()
+
+    data_version = key[-1]
+    with _figure_cache_lock:
+        # figures built from older data can never be requested again
+        stale = [k for k in _figure_cache if k[-1] != data_version]
+        for k in stale:
+            del _figure_cache[k]
+        _figure_cache[key] = fig
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+
+    return fig
+
+
+def patch_traces(fig):
+    patch = Patch()
+    # to_dict base64-encodes numeric arrays like a full figure response does;
+    # trace.to_plotly_json() would leave them as ndarrays sent as plain JSON lists
+    patch["data"] = fig.to_dict()["data"]
+    return patch
+
+
+# plotly reports the visible corners of a map as [lon, lat] pairs in map._derived
+def viewport_bounds(relayout_data):
+    corners = (relayout_data or {}).get("map._derived", {}).get("coordinates")
+    if not corners:
+        return None
+    lons = [corner[0] for corner in corners]
+    lats = [corner[1] for corner in corners]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+# Injury rows of the window `df` inside the viewport, looked up in the grid index and
+# thinned evenly to VIEWPORT_MAX_POINTS when zoomed out over a busy area
+def viewport_rows(crash_data, df, bounds):
+    injured = crash_data.injured
+    # windows are tails of the date-sorted frame
+    window_start = len(injured) - len(df)
+    if bounds is None:
+        positions = np.arange(window_start, len(injured))
+    else:
+        positions = crash_data.injured_index.query(*bounds)
+        positions = positions[positions >= window_start]
+
+    if len(positions) > VIEWPORT_MAX_POINTS:
+        keep = np.linspace(0, len(positions) - 1, VIEWPORT_MAX_POINTS).astype(int)
+        positions = positions[keep]
+    return injured.iloc[positions]
+
+
+# Injury reports and deaths for every slider window, from the daily running totals.
+# The browser renders the count text from these while the slider is dragged.
+def window_totals_data(crash_data):
+    return {
+        "min_days": 7,
+        "totals": [
+            rollups.window_totals(crash_data.cumulative_totals, days)
+            for days in range(7, MAX_DAYS + 1)
+        ],
+        "as_of": f"Data as of {crash_data.as_of:%m/%d/%Y %I:%M %p}",
+    }
 
-    # count killed cyclists in the selected window
-    killed_total = df_killed["Cyclists_Killed"].astype(int).sum()
 
-    if selected_value == "density":
-        map_fig = create_density_fig(df, slider_value, BOROUGH_COLORS)
+UPDATE_OUTPUTS = [
+    Output("map", "figure"),
+    Output("histogram", "figure"),
+    Output("window-totals", "data"),
+]
+
+_coalescer = coalesce.Coalescer()
+
+
+# A tab's requests for the same trigger are coalesced: while one renders, newer ones
+# queue and only the newest of them runs, since each carries every input's latest value.
+# Different triggers never replace each other, e.g. a slider patch can't stand in for
+# a pending view change.
+def update_all(
+    selected_value, slider_value, session_id, totals_version, relayout_data=None
+):
+    args = selected_value, slider_value, totals_version, relayout_data
+    if session_id is None:
+        return render_all(*args)
+    with _coalescer.latest((session_id, ctx.triggered_id)) as latest:
+        if not latest:
+            raise PreventUpdate
+        return render_all(*args)
+
+
+# The window totals only change with the data, so they are sent when the browser's copy
+# (or none yet) is from another data version than the one being rendered
+def window_totals_outputs(crash_data, totals_version):
+    if totals_version == crash_data.version:
+        return no_update, no_update
+    return window_totals_data(crash_data), crash_data.version
+
+
+def render_all(selected_value, slider_value, totals_version, relayout_data):
+    viewport_mode = VIEWPORT_LOADING and selected_value == "scatter"
+    # the map is only an input with VIEWPORT_LOADING on, and then panning and zooming
+    # only matter when the scatter points follow the viewport
+    if ctx.triggered_id == "map" and not viewport_mode:
+        raise PreventUpdate
+
+    # 60-day frames are fetched once on first use; narrower windows are sliced from them.
+    # Take one snapshot up front so a background refresh can't change it mid-render.
+    crash_data = constants.load_crash_data()
+    with metrics.stage("filter"):
+        df, df_killed = window_frames(crash_data, slider_value)
+
+    if viewport_mode:
+        with metrics.stage("viewport_figure"):
+            map_df = viewport_rows(crash_data, df, viewport_bounds(relayout_data))
+            map_fig = create_scatter_fig(map_df, df_killed, slider_value)
+        if ctx.triggered_id == "map":
+            return patch_traces(map_fig), no_update, no_update, no_update
     else:
-        map_fig = create_scatter_fig(df, slider_value)
+        # cache hits are timed too, so the stage shows what the callback actually waits
+        with metrics.stage(f"{selected_value}_figure"):
+            map_fig = cached_figure(
+                (selected_value, slider_value, crash_data.version),
+                lambda: build_map_fig(selected_value, df, df_killed, slider_value),
+            )
+    with metrics.stage("histogram_figure"):
+        histogram_fig = cached_figure(
+            ("histogram", slider_value, crash_data.version),
+            lambda: create_histogram_fig(crash_data.rollups["borough"], slider_value),
+        )
 
-    histogram_fig = create_histogram_fig(df, slider_value)
+    if ctx.triggered_id == "slider":
+        # moving the slider only changes the traces; patch those and leave the layout,
+        # annotations and map style (and the user's pan/zoom) as they are in the browser
+        with metrics.stage("patch"):
+            map_fig = patch_traces(map_fig)
+            histogram_fig = patch_traces(histogram_fig)
 
-    # restore the original killed dataframe
-    FULL_DF_KILLED = _original_killed
+    return map_fig, histogram_fig, *window_totals_outputs(crash_data, totals_version)
 
-    label_text = f"Currently Showing {slider_value} Days Of Crashes"
-    crash_count_injured = len(df)
-    crash_count_display = (
-        # TODO: add a date range for what is being shown in the dashboard, to tell user what is the most recent date range
-        f"In the most recent {slider_value} days of available data, there have been "
-        f"{crash_count_injured:,} cyclist injury reports and "
-        f"{killed_total:,} cyclist deaths across NYC."
-    )
 
-    return map_fig, histogram_fig, label_text, crash_count_display
+if snapshots.ENABLED:
+    # every window is prebuilt; the browser fetches it (assets/snapshots.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="snapshots", function_name="load"),
+        *UPDATE_OUTPUTS,
+        Input("dropdown", "value"),
+        Input("slider", "value"),
+        State("snapshot-url", "data"),
+    )
+else:
+    update_inputs = dict(
+        selected_value=Input("dropdown", "value"),
+        slider_value=Input("slider", "value"),
+    )
+    if VIEWPORT_LOADING:
+        # otherwise every pan and zoom would be a round trip that changes nothing
+        update_inputs["relayout_data"] = Input("map", "relayoutData")
+    app.callback(
+        output=[*UPDATE_OUTPUTS, Output("window-totals-version", "data")],
+        inputs=update_inputs,
+        state=dict(
+            session_id=State("session-id", "data"),
+            totals_version=State("window-totals-version", "data"),
+        ),
+    )(update_all)
 
+app.clientside_callback(
+    ClientsideFunction(namespace="slider", function_name="window_text"),
+    Output("slider-label", "children"),
+    Output("crash-count", "children"),
+    Input("slider", "drag_value"),
+    Input("window-totals", "data"),
+    State("slider", "value"),
+)
 
-from dash import Input, Output, State, callback_context
+# storage_type never changes; it only gives the id its one call on page load
+app.clientside_callback(
+    ClientsideFunction(namespace="slider", function_name="session_id"),
+    Output("session-id", "data"),
+    Input("session-id", "storage_type"),
+    State("session-id", "data"),
+)
 
 
 @app.callback(
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, g, request
+
+
+# Off by default; when on, stage timings and response sizes are kept in process memory
+# and served in the Prometheus text format at /metrics. Each gunicorn worker keeps and
+# serves its own numbers.
+ENABLED = os.environ.get("ENABLE_METRICS", "0") == "1"
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+HISTOGRAMS = {
+    "crash_stage_seconds": (
+        "Time spent in one stage of loading data or answering a callback",
+        SECONDS_BUCKETS,
+    ),
+    "socrata_request_seconds": (
+        "Latency of single requests to the Socrata API",
+        SECONDS_BUCKETS,
+    ),
+    "dash_callback_seconds": (
+        "Time to answer a Dash callback request, serialization included",
+        SECONDS_BUCKETS,
+    ),
+    "dash_callback_response_bytes": (
+        "Size of Dash callback response bodies",
+        BYTES_BUCKETS,
+    ),
+}
+
+# (name, sorted label pairs) -> [per-bucket counts, sum, count]
+_series = {}
+_lock = threading.Lock()
+
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    buckets = HISTOGRAMS[name][1]
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        series[0][bisect_left(buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def stage(stage_name):
+    return timer("crash_stage_seconds", stage=stage_name)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render():
+    with _lock:
+        snapshot = {key: (list(counts), total, n) for key, (counts, total, n) in _series.items()}
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (series_name, labels), (counts, total, n) in sorted(snapshot.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+# Callback requests are labelled by their output ids, e.g. "..map.figure...histogram.figure..."
+def _callback_output():
+    body = request.get_json(silent=True) or {}
+    return body.get("output", "unknown")
+
+
+def init_app(server, routes_pathname_prefix="/"):
+    if not ENABLED:
+        return
+
+    callback_path = f"{routes_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        if request.path == callback_path and "metrics_start" in g:
+            output = _callback_output()
+            observe(
+                "dash_callback_seconds",
+                time.perf_counter() - g.metrics_start,
+                output=output,
+            )
+            if not response.direct_passthrough:
+                observe(
+                    "dash_callback_response_bytes",
+                    response.calculate_content_length() or 0,
+                    output=output,
+                )
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
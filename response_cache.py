@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from flask import Response, g, request
+import constants
+import crash_store
+
+
+logger = logging.getLogger(__name__)
+
+
+# Off by default; when on, callback responses are stored pre-serialized on disk, shared by
+# all gunicorn workers, and identical callback requests for the same data version are
+# answered from there. Entries live in one directory per data version, and older
+# versions are removed once a newer one is stored.
+ENABLED = os.environ.get("RESPONSE_CACHE", "0") == "1"
+CACHE_DIR = os.environ.get(
+    "RESPONSE_CACHE_DIR", os.path.join(crash_store.CACHE_DIR, "responses")
+)
+
+# Entries kept per data version; the oldest are removed past this
+MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+
+# Panning the map sends new bounds on every move; those answers are per visitor and
+# would only fill the cache
+UNCACHED_TRIGGERS = {"map.relayoutData"}
+
+
+# Per-tab values that never change a callback's answer, left out of the key so every
+# visitor shares the entries
+KEY_IGNORED_IDS = {"session-id"}
+
+
+def _is_map_view(spec):
+    return spec.get("id") == "map" and spec.get("property") == "relayoutData"
+
+
+# The map's pan and zoom reach a callback only with VIEWPORT_LOADING on
+def has_viewport_bounds(body):
+    for spec in body.get("inputs", []):
+        value = spec.get("value") or {}
+        if _is_map_view(spec) and any(key.startswith("map.") for key in value):
+            return True
+    return False
+
+
+def request_key(body, version):
+    inputs = body.get("inputs", [])
+    if not constants.VIEWPORT_LOADING:
+        inputs = [spec for spec in inputs if not _is_map_view(spec)]
+    body = dict(
+        body,
+        inputs=inputs,
+        state=[s for s in body.get("state", []) if s.get("id") not in KEY_IGNORED_IDS],
+    )
+    # key order and whitespace don't change the callback's answer
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{version}\n{canonical}".encode()).hexdigest()
+
+
+def entry_path(version, key):
+    return os.path.join(CACHE_DIR, version, f"{key}.json")
+
+
+def load(version, key):
+    try:
+        with open(entry_path(version, key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def save(version, key, data):
+    version_dir = os.path.join(CACHE_DIR, version)
+    if not os.path.isdir(version_dir):
+        os.makedirs(version_dir, exist_ok=True)
+        # versions are timestamps that sort in time order. Workers refresh on their own
+        # timers and may still answer from an older version for a while, so only older
+        # directories are removed; the older version's goes with the next newer one.
+        for name in os.listdir(CACHE_DIR):
+            if name < version:
+                shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+
+    # written under a temporary name, so other workers never read a partial response
+    path = entry_path(version, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict(version_dir)
+
+
+def evict(version_dir, max_entries=MAX_ENTRIES):
+    entries = [e for e in os.scandir(version_dir) if e.name.endswith(".json")]
+    if len(entries) <= max_entries:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[: len(entries) - max_entries]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            # another worker evicted it first
+            pass
+
+
+def _etag_response(data, etag):
+    response = Response(data, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+# `data_version` returns the version of the data callbacks are answered from, or None
+# while it isn't loaded yet
+def init_app(server, data_version, routes_pathname_prefix="/"):
+    if not ENABLED:
+        return
+
+    callback_path = f"{routes_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def answer_from_cache():
+        if request.path != callback_path:
+            return None
+        version = data_version()
+        body = request.get_json(silent=True)
+        if version is None or body is None:
+            return None
+        if UNCACHED_TRIGGERS & set(body.get("changedPropIds", [])):
+            return None
+        if has_viewport_bounds(body):
+            return None
+
+        key = request_key(body, version)
+        # a response is fully determined by the request and the data version, so a
+        # client that has this key has this response (in whatever encoding it got it)
+        if request.if_none_match.contains_weak(key):
+            response = Response(status=304)
+            response.set_etag(key)
+            return response
+
+        data = load(version, key)
+        if data is not None:
+            return _etag_response(data, key)
+
+        g.response_cache_entry = (version, key)
+        return None
+
+    @server.after_request
+    def store_in_cache(response):
+        entry = g.pop("response_cache_entry", None)
+        if entry is None or response.status_code != 200 or response.direct_passthrough:
+            return response
+        version, key = entry
+        try:
+            save(version, key, response.get_data())
+        except OSError:
+            # e.g. another worker removed this version's directory for a newer one
+            logger.warning("could not store callback response %s", key, exc_info=True)
+        response.set_etag(key)
+        return response
@@ -0,0 +1,82 @@
+import pandas as pd
+
+
+# Daily rollups of the crash frames, one row per calendar day: cyclists injured per day
+# by each of these columns, plus daily totals for the crash-count text. The histogram and
+# counts read these instead of the raw rows, so their cost doesn't grow with the window.
+DIMENSIONS = {
+    "borough": "Borough",
+    "vehicle": "Vehicle_1",
+    "factor": "Contributing_Factor",
+}
+TOTALS = ["injury_reports", "deaths"]
+
+
+def _complete_days(frames):
+    # the same gap-free day index on every rollup, so a window is the last n rows
+    dates = [frame.index for frame in frames.values() if not frame.empty]
+    if not dates:
+        days = pd.DatetimeIndex([], name="crash_date")
+    else:
+        first = min(index.min() for index in dates)
+        last = max(index.max() for index in dates)
+        days = pd.date_range(first, last, freq="D", name="crash_date")
+    return {
+        name: frame.reindex(days, fill_value=0).astype("int64")
+        for name, frame in frames.items()
+    }
+
+
+def _daily_injured_by(injured, column):
+    daily = (
+        injured["Cyclists_Injured"]
+        .astype("int64")
+        .groupby([injured["crash_date"], injured[column]], observed=True)
+        .sum()
+        .unstack(fill_value=0)
+    )
+    # plain string columns, so rollups from different loads line up and store as feather
+    daily.columns = daily.columns.astype(str)
+    return daily
+
+
+def daily_rollups(injured, killed):
+    frames = {
+        name: _daily_injured_by(injured, column) for name, column in DIMENSIONS.items()
+    }
+    frames["totals"] = pd.DataFrame(
+        {
+            "injury_reports": injured.groupby("crash_date").size(),
+            "deaths": killed.groupby("crash_date")["Cyclists_Killed"].sum(),
+        },
+        columns=TOTALS,
+    ).fillna(0)
+    return _complete_days(frames)
+
+
+# Re-rolls only the days on or after `since`, the ones a refresh re-requested, and drops
+# days before `start` that have left the window
+def update_rollups(rollups, injured, killed, since, start):
+    fresh = daily_rollups(
+        injured[injured["crash_date"] >= since], killed[killed["crash_date"] >= since]
+    )
+    frames = {}
+    for name, frame in rollups.items():
+        kept = frame[(frame.index >= start) & (frame.index < since)]
+        frames[name] = pd.concat([kept, fresh[name]]).fillna(0)
+    return _complete_days(frames)
+
+
+# Running totals per day; the totals of any trailing window are then one subtraction
+def cumulative_totals(totals):
+    return totals[TOTALS].cumsum().to_numpy()
+
+
+def window_totals(cumulative, days):
+    if len(cumulative) == 0:
+        return 0, 0
+    totals = cumulative[-1]
+    if days < len(cumulative):
+        totals = totals - cumulative[-days - 1]
+    injury_reports, deaths = totals
+    return int(injury_reports), int(deaths)
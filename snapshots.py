@@ -0,0 +1,41 @@
+import os
+from flask import send_from_directory
+
+
+# Snapshot mode: every (view, days) window is prebuilt by export_snapshots.py into gzipped
+# JSON files, and the browser fetches them with a clientside callback instead of calling
+# update_all. Files are served from SNAPSHOT_DIR at /snapshots/, or from SNAPSHOT_URL when
+# they are uploaded to a CDN (serve them with Content-Encoding: gzip there too).
+ENABLED = os.environ.get("SERVE_SNAPSHOTS", "0") == "1"
+SNAPSHOT_DIR = os.environ.get(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+SNAPSHOT_URL = os.environ.get("SNAPSHOT_URL", "snapshots/")
+# Snapshots are rebuilt when the data changes, at most daily; browsers revalidate after this
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get("SNAPSHOT_MAX_AGE_SECONDS", 300))
+
+VIEWS = ("density", "scatter")
+MANIFEST = "manifest.json"
+
+
+def snapshot_name(view, days):
+    return f"{view}_{days}.json"
+
+
+def init_app(server, routes_pathname_prefix="/"):
+    if not ENABLED:
+        return
+
+    @server.route(f"{routes_pathname_prefix}snapshots/<name>")
+    def snapshot(name):
+        if name == MANIFEST:
+            return send_from_directory(SNAPSHOT_DIR, name, max_age=0)
+        response = send_from_directory(
+            SNAPSHOT_DIR,
+            f"{name}.gz",
+            mimetype="application/json",
+            max_age=SNAPSHOT_MAX_AGE_SECONDS,
+        )
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response